@@ -0,0 +1,313 @@
+"""
+Load test for the booking funnel, run fully in-process
+
+Drives the real FastAPI app from backend-server.py through an ASGI transport:
+available-slots -> appointments -> create-payment-order -> verify-payment
+Razorpay and the Google Apps Script webhook are replaced by local stand-in apps
+with configurable latency, so no credentials or network access are needed.
+
+Usage: python backend-benchmark.py --concurrency 1,10,50 --bookings 300
+"""
+import argparse
+import asyncio
+import codecs
+import gc
+import hashlib
+import hmac
+import importlib.util
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional
+
+import httpx
+from fastapi import FastAPI
+
+ROOT_DIR = Path(__file__).parent
+BENCH_KEY_ID = 'rzp_test_benchmark'
+BENCH_KEY_SECRET = 'benchmark_secret'
+ENDPOINTS = ("available-slots", "appointments", "create-payment-order", "verify-payment")
+
+def load_backend(backend_path: Path, store: str, work_dir: Path, module_name: str):
+    """
+    Import a fresh copy of backend-server.py configured for the benchmark
+    """
+    os.environ.update({
+        'APPOINTMENT_STORE': store,
+        'APPOINTMENTS_DB_PATH': str(work_dir / f'{module_name}.db'),
+        'RAZORPAY_KEY_ID': BENCH_KEY_ID,
+        'RAZORPAY_KEY_SECRET': BENCH_KEY_SECRET,
+        'GOOGLE_WEBHOOK_URL': 'http://google-standin/exec',
+        'WEBHOOK_POLL_INTERVAL': '0.05',
+        'LOG_FILE': str(work_dir / 'backend_debug.log'),
+        'LOG_LEVEL': 'WARNING',
+    })
+    spec = importlib.util.spec_from_file_location(module_name, backend_path)
+    backend = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = backend
+    # The checked-in file may be saved as UTF-16, which the import system cannot decode
+    raw = backend_path.read_bytes()
+    source = raw.decode('utf-16') if raw.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)) else raw.decode('utf-8-sig')
+    exec(compile(source, str(backend_path), 'exec'), backend.__dict__)
+    return backend
+
+def razorpay_standin(latency: float) -> FastAPI:
+    """
+    Razorpay Orders API stand-in, answers like the mock order path after a fixed delay
+    """
+    standin = FastAPI()
+
+    @standin.post("/v1/orders")
+    async def create_order(body: dict):
+        await asyncio.sleep(latency)
+        return {
+            "id": f"order_{uuid.uuid4().hex[:14]}",
+            "entity": "order",
+            "amount": body["amount"],
+            "currency": body["currency"],
+            "status": "created"
+        }
+
+    return standin
+
+def google_webhook_standin(latency: float, received: list) -> FastAPI:
+    standin = FastAPI()
+
+    @standin.post("/exec")
+    async def receive(payload: dict):
+        await asyncio.sleep(latency)
+        received.append(payload["id"])
+        return {"result": "success"}
+
+    return standin
+
+def bench_dates(count: int) -> list:
+    """
+    The next clinic days (no Sundays), enough to give every booking its own slot
+    """
+    dates = []
+    day = date.today() + timedelta(days=1)
+    while len(dates) < count:
+        if day.weekday() != 6:
+            dates.append(day.isoformat())
+        day += timedelta(days=1)
+    return dates
+
+def percentile(samples: list, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+class FunnelStats:
+    def __init__(self):
+        self.latencies = {endpoint: [] for endpoint in ENDPOINTS}
+        self.completed = 0
+        self.conflicts = 0
+        self.errors = 0
+
+    async def timed(self, endpoint: str, request):
+        started = time.perf_counter()
+        response = await request
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        return response
+
+async def book_once(client: httpx.AsyncClient, stats: FunnelStats, appointment_date: str, patient: int):
+    """
+    One patient going through the whole funnel, retrying on slot conflicts
+    """
+    for _ in range(5):
+        response = await stats.timed("available-slots", client.get(
+            "/api/available-slots", params={"date": appointment_date}
+        ))
+        slots = response.json()["available_slots"]
+        if not slots:
+            stats.conflicts += 1
+            return
+
+        response = await stats.timed("appointments", client.post("/api/appointments", json={
+            "patient_name": f"Benchmark Patient {patient}",
+            "patient_email": f"patient{patient}@example.com",
+            "patient_phone": f"9{patient:09d}",
+            "appointment_date": appointment_date,
+            "appointment_time": slots[patient % len(slots)],
+            "reason": "benchmark"
+        }))
+        if response.status_code == 409:
+            stats.conflicts += 1
+            continue
+        if response.status_code != 200:
+            stats.errors += 1
+            return
+        appointment_id = response.json()["id"]
+
+        response = await stats.timed("create-payment-order", client.post("/api/create-payment-order", json={
+            "amount": 50000,
+            "appointment_id": appointment_id
+        }))
+        if response.status_code != 200:
+            stats.errors += 1
+            return
+        order_id = response.json()["id"]
+
+        payment_id = f"pay_{uuid.uuid4().hex[:14]}"
+        signature = hmac.new(
+            BENCH_KEY_SECRET.encode(), f"{order_id}|{payment_id}".encode(), hashlib.sha256
+        ).hexdigest()
+        response = await stats.timed("verify-payment", client.post("/api/verify-payment", json={
+            "razorpay_order_id": order_id,
+            "razorpay_payment_id": payment_id,
+            "razorpay_signature": signature,
+            "appointment_id": appointment_id
+        }))
+        if response.status_code == 200:
+            stats.completed += 1
+        else:
+            stats.errors += 1
+        return
+    stats.errors += 1
+
+def current_rss() -> Optional[int]:
+    """
+    Resident set size right now, from /proc (Linux only)
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+def current_memory(traced: bool) -> Optional[int]:
+    """
+    Bytes allocated by Python when tracing, otherwise the current RSS
+    """
+    if traced:
+        return tracemalloc.get_traced_memory()[0]
+    return current_rss()
+
+def peak_rss() -> int:
+    """
+    Process-wide high-water mark, it never goes down and is shared by every level in a run
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # KB on Linux
+
+def store_footprint(backend) -> dict:
+    store = backend.appointment_store
+    footprint = {"outbox_depth": store.webhook_queue_depth()}
+    if isinstance(store, backend.SQLiteAppointmentStore):
+        footprint["db_bytes"] = sum(
+            Path(store.path + suffix).stat().st_size
+            for suffix in ("", "-wal") if Path(store.path + suffix).exists()
+        )
+    else:
+        footprint["appointments"] = len(store.appointments)
+        footprint["slot_dates"] = len(store.slots)
+    return footprint
+
+async def run_level(args, concurrency: int, work_dir: Path) -> dict:
+    backend = load_backend(Path(args.backend), args.store, work_dir, f"backend_bench_c{concurrency}")
+    backend.payment_gateway = backend.RazorpayGateway(
+        BENCH_KEY_ID, BENCH_KEY_SECRET,
+        base_url="http://razorpay-standin/v1",
+        transport=httpx.ASGITransport(app=razorpay_standin(args.razorpay_latency)),
+    )
+    received = []
+    backend.webhook_transport = httpx.ASGITransport(app=google_webhook_standin(args.webhook_latency, received))
+
+    stats = FunnelStats()
+    dates = bench_dates(args.bookings // len(backend.ALL_SLOTS) + 1)
+    patients = iter(range(args.bookings))
+
+    async def patient_worker(client):
+        for patient in patients:
+            await book_once(client, stats, dates[patient % len(dates)], patient)
+
+    transport = httpx.ASGITransport(app=backend.app)
+    async with backend.lifespan(backend.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://clinic") as client:
+            # tracemalloc is exact but slows every request several times over, so it is opt-in
+            if args.trace_memory:
+                tracemalloc.start()
+            gc.collect()
+            memory_before = current_memory(args.trace_memory)
+            started = time.perf_counter()
+            await asyncio.gather(*(patient_worker(client) for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+            gc.collect()
+            memory_after = current_memory(args.trace_memory)
+            if args.trace_memory:
+                tracemalloc.stop()
+
+        # Let the outbox drain so webhook delivery is part of the report
+        deadline = time.monotonic() + args.drain_timeout
+        while backend.webhook_dispatcher.queue_depth() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        footprint = store_footprint(backend)
+
+    requests_made = sum(len(samples) for samples in stats.latencies.values())
+    return {
+        "concurrency": concurrency,
+        "bookings": stats.completed,
+        "conflicts": stats.conflicts,
+        "errors": stats.errors,
+        "elapsed_s": round(elapsed, 3),
+        "bookings_per_s": round(stats.completed / elapsed, 1),
+        "requests_per_s": round(requests_made / elapsed, 1),
+        "latency_ms": {
+            endpoint: {
+                "p50": round(percentile(samples, 0.50) * 1000, 2),
+                "p95": round(percentile(samples, 0.95) * 1000, 2),
+                "p99": round(percentile(samples, 0.99) * 1000, 2),
+                "mean": round(statistics.fmean(samples) * 1000, 2),
+            }
+            for endpoint, samples in stats.latencies.items() if samples
+        },
+        "memory_growth_kb": None if memory_before is None else round((memory_after - memory_before) / 1024, 1),
+        "memory_measure": "tracemalloc" if args.trace_memory else "rss",
+        "peak_rss_kb": round(peak_rss() / 1024, 1),
+        "webhooks_delivered": len(received),
+        "store": footprint,
+    }
+
+def print_report(result: dict):
+    print(f"\n=== concurrency {result['concurrency']} ===")
+    print(f"bookings {result['bookings']} in {result['elapsed_s']}s "
+          f"({result['bookings_per_s']} bookings/s, {result['requests_per_s']} req/s), "
+          f"conflicts {result['conflicts']}, errors {result['errors']}")
+    print(f"{'endpoint':<22}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for endpoint, latency in result["latency_ms"].items():
+        print(f"{endpoint:<22}{latency['p50']:>10}{latency['p95']:>10}{latency['p99']:>10}")
+    print(f"memory growth {result['memory_growth_kb']} KB ({result['memory_measure']}), peak RSS {result['peak_rss_kb']} KB, "
+          f"webhooks delivered {result['webhooks_delivered']}, store {result['store']}")
+
+async def main():
+    parser = argparse.ArgumentParser(description="In-process booking funnel benchmark")
+    parser.add_argument("--concurrency", default="1,10,50", help="Comma separated concurrency levels")
+    parser.add_argument("--bookings", type=int, default=300, help="Bookings attempted per level")
+    parser.add_argument("--backend", default=str(ROOT_DIR / 'backend-server.py'), help="Path to the backend module")
+    parser.add_argument("--store", choices=("memory", "sqlite"), default="sqlite")
+    parser.add_argument("--razorpay-latency", type=float, default=0.15, help="Stand-in order latency (s)")
+    parser.add_argument("--webhook-latency", type=float, default=0.5, help="Stand-in webhook latency (s)")
+    parser.add_argument("--drain-timeout", type=float, default=10.0, help="Max wait for the webhook outbox (s)")
+    parser.add_argument("--trace-memory", action="store_true", help="Measure memory growth with tracemalloc")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for concurrency in (int(level) for level in args.concurrency.split(",")):
+            result = await run_level(args, concurrency, Path(work_dir))
+            results.append(result)
+            if not args.json:
+                print_report(result)
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(main())